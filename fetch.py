@@ -3,10 +3,30 @@
 
 from __future__ import annotations
 
-import subprocess
-from argparse import ArgumentParser, Namespace, ArgumentDefaultsHelpFormatter
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser, Namespace
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from http.client import HTTPException, HTTPSConnection
+import os
 from pathlib import Path
 import sys
+import threading
+from typing import Iterable
+
+from setup import day_range
+
+HOST = "adventofcode.com"
+"""Host serving the puzzle inputs."""
+
+USER_AGENT = "github.com/alexhrao/aoc-2021/blob/main/fetch.py by alexhrao"
+"""Identifies this script (and who to contact about it) to `HOST`, as it asks
+automated tools to."""
+
+MAX_WORKERS = 8
+"""Maximum number of inputs to fetch concurrently."""
+
+_LOCAL = threading.local()
+"""Per-thread state; each thread keeps its own keep-alive connection to `HOST`."""
 
 
 class Args(Namespace):
@@ -14,46 +34,118 @@ class Args(Namespace):
 
     day: int | None
     """Day to fetch"""
+    days: list[int] | None
+    """Days to fetch, instead of just `day`"""
     cookie: str | None
     """Cookie to use"""
+    force: bool
+    """Whether to fetch the input even if it's already present"""
+
+
+def latest_day() -> int | None:
+    """Latest day that has a `dayNN` directory, if any."""
+    with os.scandir() as it:
+        days = [
+            int(e.name[3:])
+            for e in it
+            if e.name.startswith("day") and e.name[3:].isdigit()
+        ]
+    return max(days, default=None)
 
 
 def parse_args() -> Args:
     """Parse CLI Arguments."""
     parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
-    day = max((int(d.name[3:]) for d in Path.cwd().glob("day*")), default=None)
-    parser.add_argument("day", type=int, help="Day to fetch", nargs="?", default=day)
+    parser.add_argument(
+        "day", type=int, help="Day to fetch", nargs="?", default=latest_day()
+    )
+    parser.add_argument(
+        "--days",
+        type=day_range,
+        help="Range of days to fetch at once, e.g. `1-25`",
+    )
     parser.add_argument("--cookie", help="Auth cookie. Otherwise, `auth.txt` is used")
+    parser.add_argument(
+        "--force",
+        "-f",
+        action="store_true",
+        help="Fetch the input even if it has already been downloaded",
+    )
     return parser.parse_args(namespace=Args())
 
 
-def fetch(day: int, cookie: str | None = None) -> None:
+@cache
+def _load_cookie() -> str:
+    """Read the session cookie from `auth.txt`, only touching the file once."""
+    return Path("auth.txt").read_text(encoding="utf8").strip("\n")
+
+
+def _get(path: str, cookie: str) -> bytes:
+    """GET the given path from `HOST`, reusing this thread's connection."""
+    conn: HTTPSConnection | None = getattr(_LOCAL, "conn", None)
+    if conn is None:
+        conn = _LOCAL.conn = HTTPSConnection(HOST)
+    headers = {"Cookie": f"session={cookie}", "User-Agent": USER_AGENT}
+    try:
+        conn.request("GET", path, headers=headers)
+        resp = conn.getresponse()
+    except (HTTPException, OSError):
+        # The server may have dropped the idle connection; closing it makes the
+        # next request reconnect
+        conn.close()
+        conn.request("GET", path, headers=headers)
+        resp = conn.getresponse()
+    body = resp.read()
+    if resp.status != 200:
+        raise RuntimeError(f"Failed to fetch {path}: {resp.status} {resp.reason}")
+    return body
+
+
+def fetch(day: int, cookie: str | None = None, force: bool = False) -> None:
     """Fetch the input for a given day, optionally using the given cookie.
 
-    If the cookie is not given, a local `auth.txt` file is read
+    If the cookie is not given, a local `auth.txt` file is read. Inputs never
+    change, so nothing is fetched if the input is already present, unless `force`
+    is given
     """
+    out = Path("inputs", f"day{day:02d}.txt")
+    if not force and out.exists() and out.stat().st_size > 0:
+        return
     if cookie is None:
-        with Path("auth.txt").open("r", encoding="utf8") as fid:
-            cookie = fid.read().strip("\n")
-    tgt = Path("inputs")
-    tgt.mkdir(parents=True, exist_ok=True)
-    subprocess.run(
-        [
-            "curl",
-            f"https://adventofcode.com/2021/day/{day}/input",
-            "-H",
-            f"Cookie: session={cookie}",
-            "-o",
-            tgt.joinpath(f"day{day:02d}.txt").resolve(),
-            "-s",
-        ],
-        check=True,
-    )
+        cookie = _load_cookie()
+    body = _get(f"/2021/day/{day}/input", cookie)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    # Write it elsewhere and move it into place, so an interrupted write doesn't
+    # leave behind a partial input that's then skipped as already fetched
+    tmp = out.with_name(f".{out.name}.{os.getpid()}")
+    try:
+        tmp.write_bytes(body)
+        tmp.replace(out)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def fetch_many(
+    days: Iterable[int],
+    cookie: str | None = None,
+    force: bool = False,
+) -> None:
+    """Fetch the inputs for all the given days concurrently.
+
+    This otherwise behaves exactly like `fetch`
+    """
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
+        # Consume the results so that any failure is raised here
+        list(ex.map(lambda day: fetch(day, cookie, force), days))
 
 
 if __name__ == "__main__":
     args = parse_args()
-    if args.day is None:
+    if args.days is not None:
+        fetch_many(args.days, args.cookie, args.force)
+    elif args.day is None:
         print("Day is required", file=sys.stderr)
         sys.exit(1)
-    fetch(args.day, args.cookie)
+    else:
+        fetch(args.day, args.cookie, args.force)
@@ -3,24 +3,61 @@
 
 from __future__ import annotations
 
-import re
+import os
 import subprocess
 import sys
+from array import array
 from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser, Namespace
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from statistics import mean
-from time import process_time_ns
-from typing import Callable
+from statistics import median
+from time import perf_counter_ns
+from typing import Callable, NamedTuple, cast
 
-from fetch import fetch
+from fetch import fetch, latest_day
 from setup import SUFFIX_LANGS, Language
 
-ENTRY_PAT = re.compile(r"^(\w+)-(\w+)-day\d+$")
-"""Pattern that a directory is expected to follow."""
+BENCH_PREFIX = "BENCH "
+"""Prefix of the timing lines printed by an entry's `--bench` harness."""
 
 type Sample = tuple[int, int]
 """A single time sample."""
 
+type Samples = tuple[array[int], array[int]]
+"""The times of every round, one buffer for each part."""
+
+type Command = list[str | Path]
+"""A command that runs an entry; the part to run is appended to it."""
+
+
+class HarnessError(RuntimeError):
+    """An entry's `--bench` harness stopped replying, or it doesn't have one."""
+
+
+class Entry(NamedTuple):
+    """A single attempt at the day."""
+
+    lang: Language
+    """Language the attempt is written in"""
+    user: str
+    """User who made the attempt"""
+    path: Path
+    """Directory of the attempt"""
+    cmd: Command
+    """Command that runs the attempt"""
+    prepare: Callable[[Path], None] | None
+    """Anything that needs to happen once before running, like compilation"""
+
+
+class Result(NamedTuple):
+    """An entry's samples, and how they were taken."""
+
+    samples: Samples
+    """Times of every round"""
+    fallback: bool = False
+    """Whether `--harness` was asked for, but a process was started per part instead,
+    so these include startup and can't be compared with the harness' times"""
+
 
 class Args(Namespace):
     """CLI Arguments."""
@@ -30,13 +67,15 @@ class Args(Namespace):
     warmup_rounds: int
     """Number of warmup rounds to execute"""
     num_rounds: int
-    """Number of rounds over which to average"""
+    """Number of rounds to take the median of"""
+    harness: bool
+    """Whether to run all rounds in one long-lived process using the harness"""
 
 
 def parse_args() -> Args:
     """Parse CLI arguments."""
     parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
-    day = max((int(d.name[3:]) for d in Path.cwd().glob("day*")), default=None)
+    day = latest_day()
 
     if day is None:
         print("No days available to execute", file=sys.stderr)
@@ -60,76 +99,157 @@ def parse_args() -> Args:
         "--num-rounds",
         "-n",
         type=int,
-        help="Number of rounds to run; the result is the average",
+        help="Number of rounds to run; the result is the median",
         default=1,
     )
+    parser.add_argument(
+        "--harness",
+        action="store_true",
+        help="Keep one process per entry alive across rounds with its `--bench` "
+        "harness, so interpreter startup isn't timed",
+    )
     args = parser.parse_args(namespace=Args())
     args.num_rounds = max(args.num_rounds, 1)
     args.warmup_rounds = max(args.warmup_rounds, 0)
     return args
 
 
-def run_py(d: Path) -> Sample:
-    """Run the given path as Python, returning the combined time."""
-    # Create a runner
-    start = process_time_ns()
-    # Use the python venv
+def parse_entry(name: str) -> tuple[str, str] | None:
+    """Split an entry's directory name, `LANG-USER-dayNN`, into its language and user.
+
+    If the name doesn't follow that pattern, `None` is returned
+    """
+    parts = name.split("-")
+    if len(parts) != 3:
+        return None
+    lang, user, day = parts
+    if not lang or not user or not day.startswith("day") or not day[3:].isdigit():
+        return None
+    return lang, user
+
+
+def artifact_name(d: Path) -> str:
+    """Name of the module/crate (and so the built binary) in the given entry.
+
+    `setup.py` names these after the day, which is the last part of the entry name
+    """
+    return d.name.rsplit("-", 1)[-1]
+
+
+def run(d: Path, cmd: Command) -> Sample:
+    """Run the command once per part in the given entry, returning the time of each."""
+    start = perf_counter_ns()
     subprocess.run(
-        [Path(".venv", "bin", "python3"), "main.py", "1"],
+        [*cmd, "1"],
         check=True,
         cwd=d,
         stdout=subprocess.DEVNULL,
         stderr=subprocess.DEVNULL,
     )
-    p1 = process_time_ns() - start
-    start = process_time_ns()
-    # Use the python venv
+    p1 = perf_counter_ns() - start
+    start = perf_counter_ns()
     subprocess.run(
-        [Path(".venv", "bin", "python3"), "main.py", "2"],
+        [*cmd, "2"],
         check=True,
         cwd=d,
         stdout=subprocess.DEVNULL,
         stderr=subprocess.DEVNULL,
     )
-    return p1, process_time_ns() - start
+    return p1, perf_counter_ns() - start
+
+
+def request_part(proc: subprocess.Popen[str], part: str) -> int:
+    """Ask the entry's harness to run the given part, returning the time it took."""
+    assert proc.stdin is not None and proc.stdout is not None
+    try:
+        proc.stdin.write(f"{part}\n")
+        proc.stdin.flush()
+    except BrokenPipeError as exc:
+        raise HarnessError(f"Harness exited before running part {part}") from exc
+    while line := proc.stdout.readline():
+        if line.startswith(BENCH_PREFIX):
+            return int(line[len(BENCH_PREFIX) :])
+    raise HarnessError(f"Harness exited before finishing part {part}")
 
 
-def run_go(d: Path) -> Sample:
-    """Run the given path as a go module, returning the combined time.
+def new_samples(rounds: int) -> Samples:
+    """Zeroed buffers for the given number of rounds."""
+    return array("q", [0]) * rounds, array("q", [0]) * rounds
 
-    This builds the module before running it, so build times aren't included
+
+def sample(d: Path, cmd: Command, rounds: int) -> Samples:
+    """Run the given number of rounds, each with a fresh process per part."""
+    p1s, p2s = new_samples(rounds)
+    for i in range(rounds):
+        p1s[i], p2s[i] = run(d, cmd)
+    return p1s, p2s
+
+
+def bench(d: Path, cmd: Command, warmup: int, rounds: int) -> Samples:
+    """Run every round within a single, persistent process, using its harness.
+
+    The entry is started once with `--bench`, and then runs the part (`1` or `2`)
+    written to each line of its stdin, replying with a `BENCH NS` line that has the
+    time it took in nanoseconds. This means interpreter or VM startup is only paid
+    once, and isn't included in the returned samples. Warmup rounds happen in the
+    same process, but aren't returned. If the entry has no harness (or it stops
+    replying), this raises `HarnessError`
     """
-    subprocess.run(
-        ["go", "build", "."],
+    with subprocess.Popen(
+        [*cmd, "--bench"],
         cwd=d,
-        check=True,
-        stdout=subprocess.DEVNULL,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
         stderr=subprocess.DEVNULL,
-    )
-    start = process_time_ns()
+        text=True,
+    ) as proc:
+        for _ in range(warmup):
+            request_part(proc, "1")
+            request_part(proc, "2")
+        p1s, p2s = new_samples(rounds)
+        for i in range(rounds):
+            p1s[i] = request_part(proc, "1")
+            p2s[i] = request_part(proc, "2")
+        assert proc.stdin is not None
+        proc.stdin.close()
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, proc.args)
+    return p1s, p2s
+
+
+def command_py(d: Path) -> Command:
+    """Command to run the given path as Python.
+
+    This uses the entry's venv if it has one, and otherwise this interpreter
+    """
+    venv = Path(".venv", "bin", "python3")
+    return [venv if d.joinpath(venv).exists() else sys.executable, "main.py"]
+
+
+def prepare_go(d: Path) -> None:
+    """Build the go module at the given path."""
     subprocess.run(
-        ["go", "run", ".", "--", "1"],
-        check=True,
+        ["go", "build", "."],
         cwd=d,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-    )
-    p1 = process_time_ns() - start
-    start = process_time_ns()
-    subprocess.run(
-        ["go", "run", ".", "--", "2"],
         check=True,
-        cwd=d,
         stdout=subprocess.DEVNULL,
         stderr=subprocess.DEVNULL,
     )
-    return p1, process_time_ns() - start
 
 
-def run_ts(d: Path) -> Sample:
-    """Run the given path as a typescript script, returning the combined time.
+def command_go(d: Path) -> Command:
+    """Command to run the given path as a go module.
+
+    The module must already be built by `prepare_go`, so build times aren't included
+    """
+    # Run the built binary directly; `go run` would recompile it every time
+    return [d.joinpath(artifact_name(d)).resolve()]
+
+
+def prepare_ts(d: Path) -> None:
+    """Compile the typescript at the given path to javascript.
 
-    This compiles before running it, so compilation times aren't included
+    Once compiled, it's run with `command_js`
     """
     subprocess.run(
         ["npx", "tsc"],
@@ -138,66 +258,64 @@ def run_ts(d: Path) -> Sample:
         stdout=subprocess.DEVNULL,
         stderr=subprocess.DEVNULL,
     )
-    return run_js(d)
 
 
-def run_js(d: Path) -> Sample:
-    """Run the given path as a node.js script, returning the combined time."""
-    start = process_time_ns()
-    subprocess.run(
-        ["node", "index.js", "--", "1"],
-        check=True,
-        cwd=d,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-    )
-    p1 = process_time_ns() - start
-    start = process_time_ns()
+def command_js(_d: Path) -> Command:
+    """Command to run the given path as a node.js script."""
+    return ["node", "index.js"]
+
+
+def prepare_rs(d: Path) -> None:
+    """Build the cargo crate at the given path in release mode."""
     subprocess.run(
-        ["node", "index.js", "--", "2"],
+        ["cargo", "build", "--release", "--quiet"],
         check=True,
         cwd=d,
         stdout=subprocess.DEVNULL,
         stderr=subprocess.DEVNULL,
     )
-    return p1, process_time_ns() - start
 
 
-def run_rs(d: Path) -> Sample:
-    """Run the given path as a cargo crate, returning the combined time.
+def command_rs(d: Path) -> Command:
+    """Command to run the given path as a cargo crate.
 
-    This builds the crate in release mode before running it, so compilation time
-    isn't included in the returned value
+    The crate must already be built by `prepare_rs`, so compilation time isn't
+    included when it's run
     """
-    subprocess.run(
-        ["cargo", "build", "--release", "--quiet"],
-        check=True,
-        cwd=d,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-    )
-    # Now run it and time it
-    start = process_time_ns()
-    subprocess.run(
-        ["cargo", "run", "--release", "--quiet", "--", "1"],
-        check=True,
-        cwd=d,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-    )
-    p1 = process_time_ns() - start
-    start = process_time_ns()
-    subprocess.run(
-        ["cargo", "run", "--release", "--quiet", "--", "2"],
-        check=True,
-        cwd=d,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-    )
-    return p1, process_time_ns() - start
+    # Run the binary directly so cargo's own startup and freshness checks aren't
+    # included
+    return [d.joinpath("target", "release", artifact_name(d)).resolve()]
 
 
-def summarize(times: dict[Language, dict[str, list[Sample]]]) -> None:
+class Runner(NamedTuple):
+    """How to run the entries for a language."""
+
+    command: Callable[[Path], Command]
+    """Creates the command that runs an entry"""
+    prepare: Callable[[Path], None] | None = None
+    """Anything that needs to happen once before running, like compilation"""
+
+
+RUNNERS: dict[Language, Runner] = {
+    "go": Runner(command_go, prepare_go),
+    "py": Runner(command_py),
+    "js": Runner(command_js),
+    "ts": Runner(command_js, prepare_ts),
+    "rs": Runner(command_rs, prepare_rs),
+}
+"""Runner mapping. The value says how to run a directory that `setup.dispatch` set
+up for that language"""
+
+
+def warm_up(entry: Entry, rounds: int) -> None:
+    """Prepare the entry and run it the given number of times, discarding the times."""
+    if entry.prepare is not None:
+        entry.prepare(entry.path)
+    for _ in range(rounds):
+        run(entry.path, entry.cmd)
+
+
+def summarize(times: dict[Language, dict[str, Result]]) -> None:
     """Summarize the combined times."""
     # Keyed by lang, then by name
     for lang in sorted(times.keys()):
@@ -206,10 +324,12 @@ def summarize(times: dict[Language, dict[str, list[Sample]]]) -> None:
         if len(users) == 0:
             print(" == No Submissions ==")
             continue
-        for user, parts in users.items():
-            p1 = int(mean(p[0] for p in parts))
-            p2 = int(mean(p[1] for p in parts))
-            print(f"  * {user} ({p1 / 1000000}ms, {p2 / 1000000}ms)")
+        for user, ((p1s, p2s), fallback) in users.items():
+            # The median isn't thrown off by the odd GC pause or scheduling hiccup
+            p1 = int(median(p1s))
+            p2 = int(median(p2s))
+            note = " (process per part)" if fallback else ""
+            print(f"  * {user} ({p1 / 1000000}ms, {p2 / 1000000}ms){note}")
 
 
 if __name__ == "__main__":
@@ -219,33 +339,52 @@ if __name__ == "__main__":
         print(f"There are no attempts for day {args.day}", file=sys.stderr)
         sys.exit(1)
     fetch(args.day)
-    times: dict[Language, dict[str, list[Sample]]] = {}
-    print(f"Taking samples for day {args.day}")
-    for entry in day.iterdir():
-        match = ENTRY_PAT.fullmatch(entry.name)
-        if match is None:
-            print(f"Invalid entry '{entry.name}'", file=sys.stderr)
+    times: dict[Language, dict[str, Result]] = {}
+    entries: list[Entry] = []
+    with os.scandir(day) as it:
+        dirents = list(it)
+    for dirent in dirents:
+        parsed = parse_entry(dirent.name)
+        if parsed is None:
+            print(f"Invalid entry '{dirent.name}'", file=sys.stderr)
             sys.exit(1)
-        [lang, user] = match.groups()
-        runner: Callable[[Path], Sample]
-        if lang == "py":
-            runner = run_py
-        elif lang == "go":
-            runner = run_go
-        elif lang == "ts":
-            runner = run_ts
-        elif lang == "js":
-            runner = run_js
-        elif lang == "rs":
-            runner = run_rs
-        else:
-            print(f"Unknown language '{lang}'; skipping", file=sys.stderr)
+        [name, user] = parsed
+        if name not in RUNNERS:
+            print(f"Unknown language '{name}'; skipping", file=sys.stderr)
             continue
+        lang = cast(Language, name)
+        runner = RUNNERS[lang]
         if lang not in times:
             times[lang] = {}
-        for _ in range(args.warmup_rounds):
-            runner(entry)
-        times[lang][user] = [runner(entry) for _ in range(args.num_rounds)]
+        path = Path(dirent.path)
+        entries.append(Entry(lang, user, path, runner.command(path), runner.prepare))
+
+    print(f"Taking samples for day {args.day}")
+    # Building and warming up only have to work, not be timed, so do every entry at
+    # once; the harness warms up in its own process, so it only needs preparing
+    warmup_rounds = 0 if args.harness else args.warmup_rounds
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as ex:
+        list(ex.map(lambda e: warm_up(e, warmup_rounds), entries))
+    # Measurements are taken one at a time, so entries don't contend with each other
+    for entry in entries:
+        if args.harness:
+            try:
+                times[entry.lang][entry.user] = Result(
+                    bench(entry.path, entry.cmd, args.warmup_rounds, args.num_rounds)
+                )
+                continue
+            except HarnessError:
+                print(
+                    f"No working harness in '{entry.path.name}'; "
+                    "starting a process per part instead",
+                    file=sys.stderr,
+                )
+            # It wasn't warmed up with the rest, since the harness would have done it
+            for _ in range(args.warmup_rounds):
+                run(entry.path, entry.cmd)
+        times[entry.lang][entry.user] = Result(
+            sample(entry.path, entry.cmd, args.num_rounds), fallback=args.harness
+        )
 
     print(f"Results for day {args.day}")
     summarize(times)
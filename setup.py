@@ -3,15 +3,21 @@
 
 from __future__ import annotations
 
-import json
 import os
-import stat
-import subprocess
 import sys
-from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser, Namespace
-from getpass import getuser
+from argparse import (
+    ArgumentDefaultsHelpFormatter,
+    ArgumentParser,
+    ArgumentTypeError,
+    Namespace,
+)
 from pathlib import Path
-from typing import Callable, Literal
+from typing import TYPE_CHECKING, Literal
+
+# Anything only needed to actually set up a directory is imported where it's used,
+# so that erroring out (or `run.py` importing this) doesn't pay for it
+if TYPE_CHECKING:
+    import subprocess
 
 type Language = Literal["rs", "py", "go", "js", "ts"]
 """An allowed programming language suffix"""
@@ -37,70 +43,365 @@ SUFFIX_LANGS: dict[Language, str] = {
 }
 """Language file suffixes mapped to their standard name"""
 
+LANG_CHOICES: dict[str, Language] = {
+    **{suffix: suffix for suffix in SUFFIXES},
+    **{name.lower(): suffix for name, suffix in LANG_SUFFIXES.items()},
+}
+"""Everything `setup.py` accepts as a language (lowercased), mapped to its suffix"""
+
+PY_MAIN = '''\
+#!/usr/bin/env python3
+"""Python implementation for day {day:02d}."""
+
+import os
+from sys import argv, stdin
+from time import perf_counter_ns
+
+# Only what's already loaded at startup is imported up here, so runs that don't
+# read the input don't pay for anything
+INPUT = os.path.join(os.path.dirname(__file__), "../../inputs/day{day:02d}.txt")
+
+
+def load_lines():
+    """Read the input as a list of lines (as bytes)."""
+    with open(INPUT, "rb") as f:
+        return f.read().splitlines()
+
+
+def load_ints():
+    """Read the input as a NumPy array of one integer per line.
+
+    This needs NumPy; see requirements.txt
+    """
+    import numpy as np
+
+    return np.loadtxt(INPUT, dtype=np.int64, ndmin=1)
+
+
+def part1():
+    pass
+
+
+def part2():
+    pass
+
+
+def bench():
+    """Run the part on each line of stdin, then print `BENCH NS`."""
+    for line in stdin:
+        part = part1 if line.strip() == "1" else part2
+        start = perf_counter_ns()
+        part()
+        print(f"BENCH {{perf_counter_ns() - start}}", flush=True)
+
+
+if __name__ == "__main__":
+    if len(argv) > 1 and argv[1] == "--bench":
+        bench()
+    else:
+        if len(argv) < 2 or argv[1] == "1":
+            print("Part 1")
+            part1()
+        if len(argv) < 2 or argv[1] == "2":
+            print("Part 2")
+            part2()
+'''
+"""Template for a Python attempt's `main.py`, to be formatted with the `day`"""
+
+GO_MAIN = """\
+package main
+
+import (
+\t"bufio"
+\t"fmt"
+\t"os"
+\t"strings"
+\t"time"
+)
+
+func part1() {}
+
+func part2() {}
+
+// bench runs the part on each line of stdin, then prints "BENCH NS"
+func bench() {
+\tscanner := bufio.NewScanner(os.Stdin)
+\tfor scanner.Scan() {
+\t\tpart := part2
+\t\tif strings.TrimSpace(scanner.Text()) == "1" {
+\t\t\tpart = part1
+\t\t}
+\t\tstart := time.Now()
+\t\tpart()
+\t\tfmt.Println("BENCH", time.Since(start).Nanoseconds())
+\t}
+}
+
+func main() {
+\tif len(os.Args) > 1 && os.Args[1] == "--bench" {
+\t\tbench()
+\t\treturn
+\t}
+\tif len(os.Args) < 2 || os.Args[1] == "1" {
+\t\tfmt.Println("Part 1")
+\t\tpart1()
+\t}
+\tif len(os.Args) < 2 || os.Args[1] == "2" {
+\t\tfmt.Println("Part 2")
+\t\tpart2()
+\t}
+}
+"""
+"""Template for a go attempt's `main.go`"""
+
+JS_INDEX = """\
+function part1() {}
+
+function part2() {}
+
+if (process.argv[2] === "--bench") {
+    // Run the part on each line of stdin, then print "BENCH NS"
+    const rl = require("readline").createInterface({ input: process.stdin });
+    rl.on("line", (line) => {
+        const part = line.trim() === "1" ? part1 : part2;
+        const start = process.hrtime.bigint();
+        part();
+        console.log(`BENCH ${process.hrtime.bigint() - start}`);
+    });
+} else {
+    if (process.argv.length < 3 || process.argv[2] === "1") {
+        console.log("Part 1");
+        part1();
+    }
+
+    if (process.argv.length < 3 || process.argv[2] === "2") {
+        console.log("Part 2");
+        part2();
+    }
+}
+"""
+"""Template for a node.js (or Typescript) attempt's `index.js` (or `index.ts`)"""
+
+RS_MAIN = """\
+use std::io::BufRead;
+use std::time::Instant;
+
+fn part1() {}
+
+fn part2() {}
+
+fn main() {
+    let args: Vec<String> = std::env::args().collect();
+    if args.len() > 1 && args[1] == "--bench" {
+        // Run the part on each line of stdin, then print "BENCH NS"
+        for line in std::io::stdin().lock().lines() {
+            let part = if line.expect("failed to read stdin").trim() == "1" {
+                part1
+            } else {
+                part2
+            };
+            let start = Instant::now();
+            part();
+            println!("BENCH {}", start.elapsed().as_nanos());
+        }
+        return;
+    }
+    let (p1, p2) = if let Some(which) = args.get(1) {
+        (which == "1", which == "2")
+    } else {
+        (true, true)
+    };
+    if p1 {
+        println!("Part 1");
+        part1();
+    }
+    if p2 {
+        println!("Part 2");
+        part2();
+    }
+}
+"""
+"""Template for a Rust attempt's `src/main.rs`"""
+
+PACKAGE_JSON = """\
+{{
+  "name": "day{day:02d}",
+  "version": "1.0.0",
+  "description": "",
+  "main": "index.js",
+  "scripts": {{
+    "test": "echo \\"Error: no test specified\\" && exit 1",
+    "start": "{start}"
+  }},
+  "keywords": [],
+  "author": "",
+  "license": "ISC"
+}}"""
+"""Template for a node project's `package.json`, as `npm init -y` would create it.
+
+This is formatted with the `day` and `start` script, which mustn't need escaping
+"""
+
+TSCONFIG_JSON = """\
+{
+  "compilerOptions": {
+    "target": "es2016",
+    "module": "commonjs",
+    "esModuleInterop": true,
+    "forceConsistentCasingInFileNames": true,
+    "strict": true,
+    "skipLibCheck": true,
+    "types": ["node"]
+  }
+}
+"""
+"""Template for a Typescript attempt's `tsconfig.json`.
+
+This compiles `index.ts` to a CommonJS `index.js` next to it; the template uses
+node's `require` and `process`, so node's types (installed by `setup_ts`) are loaded
+"""
+
 
 class Args(Namespace):
     """Parsed CLI Arguments."""
 
-    day: int
-    """Day to set up."""
+    days: list[int]
+    """Days to set up."""
     lang: Language
     """Language to use."""
     user: Literal["ahr", "ukr"]
     """User who is making the attempt."""
+    venv: bool
+    """Whether to create a virtual environment for Python attempts."""
+
+
+def day_range(value: str) -> list[int]:
+    """Parse a single day (`5`) or an inclusive range of days (`1-25`)."""
+    first, _, last = value.partition("-")
+    try:
+        start = int(first)
+        stop = int(last) if last else start
+    except ValueError as exc:
+        raise ArgumentTypeError(f"invalid day range: '{value}'") from exc
+    if start > stop:
+        raise ArgumentTypeError(f"invalid day range: '{value}'")
+    return list(range(start, stop + 1))
 
 
 def parse_args() -> Args:
     """Parse CLI Arguments."""
     parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
-    parser.add_argument("day", type=int, help="Day you want to setup, starting with 1")
+    parser.add_argument(
+        "days",
+        metavar="day",
+        type=day_range,
+        help="Day you want to setup, starting with 1, or a range of days, e.g. `1-5`",
+    )
     parser.add_argument(
         "lang",
         type=str.lower,
-        choices=SUFFIXES,
-        help="Language you want to use",
+        choices=LANG_CHOICES,
+        help="Language you want to use, by suffix or name",
     )
     parser.add_argument(
         "user",
         choices=["ahr", "ukr"],
-        help="Who are you",
-        default="ahr" if getuser().startswith("al") else "ukr",
+        nargs="?",
+        help="Who are you; guessed from your login name if not given",
+    )
+    parser.add_argument(
+        "--venv",
+        action="store_true",
+        help="Create a virtual environment for a Python attempt, for dependencies",
     )
 
-    return parser.parse_args(namespace=Args())
-
-
-def setup_py(d: Path, day: int) -> None:
-    """Set up the directory as a Python3 script."""
-    subprocess.run(["python3", "-m", "venv", ".venv"], check=True, cwd=d)
-    with d.joinpath("main.py").open("w", encoding="utf8") as fid:
-        fid.writelines(
-            [
-                "#!/usr/bin/env python3\n",
-                f'"""Python implementation for day {day:02d}."""\n',
-                "\n",
-                "from sys import argv\n\ndef part1():\n",
-                "    pass\n",
-                "\n",
-                "\n",
-                "def part2():\n",
-                "    pass\n",
-                "\n",
-                'if __name__ == "__main__":\n',
-                '    if len(argv) < 2 or argv[1] == "1":\n'
-                "        print('Part 1')\n    part1()\n",
-                '    if len(argv) < 2 or argv[1] == "2":\n'
-                "        print('Part 2')\n    part2()\n",
-            ],
-        )
-        st = os.fstat(fid.fileno())
-        os.fchmod(fid.fileno(), st.st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    args = parser.parse_args(namespace=Args())
+    args.lang = LANG_CHOICES[args.lang]
+    if args.user is None:
+        # Only look up the login name when it's actually needed
+        from getpass import getuser
+
+        args.user = "ahr" if getuser().startswith("al") else "ukr"
+    return args
+
+
+def write_files(d: Path, files: dict[str, str | bytes], mode: int = 0o666) -> None:
+    """Write each of the files, by name relative to the directory, with the mode.
+
+    These are all tiny and written in one go, so skip the buffered file objects.
+    Like `open`, the mode is still masked by the umask
+    """
+    root = os.fspath(d)
+    for name, body in files.items():
+        # Joining strings avoids building a Path per file
+        path = os.path.join(root, name)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+        try:
+            data = memoryview(body.encode("utf8") if isinstance(body, str) else body)
+            while data:
+                data = data[os.write(fd, data) :]
+        finally:
+            os.close(fd)
+
+
+def wait_all(*procs: subprocess.Popen[bytes]) -> None:
+    """Wait for all the given processes to finish, raising if any of them failed."""
+    import subprocess
 
-    with d.joinpath(".gitignore").open("w", encoding="utf8") as fid:
-        fid.write("/.venv\n*.pyc\n__pycache__\n")
+    for proc in procs:
+        proc.wait()
+    for proc in procs:
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, proc.args)
+
+
+def setup_py(d: Path, day: int, venv: bool = False) -> None:
+    """Set up the directory as a Python3 script.
+
+    Creating a virtual environment takes a while and the script only needs the
+    standard library, so one is only created if `venv` is given
+    """
+    import subprocess
+
+    venv_proc = None
+    if venv:
+        import shutil
+
+        # uv creates virtual environments much faster, so use it if it's installed.
+        # Bootstrapping pip is most of the time venv takes, so skip it; even so,
+        # this is the slowest part, so write the scaffold while it runs
+        uv = shutil.which("uv")
+        venv_proc = subprocess.Popen(
+            [uv, "venv", ".venv"]
+            if uv is not None
+            else ["python3", "-m", "venv", "--without-pip", ".venv"],
+            cwd=d,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+    write_files(d, {"main.py": PY_MAIN.format(day=day)}, mode=0o777)
+    write_files(
+        d,
+        {
+            "requirements.txt": (
+                "# Only needed if you use load_ints()\n"
+                "numpy\n"
+            ),
+            ".gitignore": (
+                "# If you need dependencies:\n"
+                "# python3 -m venv .venv && .venv/bin/pip install -r requirements.txt\n"
+                "/.venv\n*.pyc\n__pycache__\n"
+            ),
+        },
+    )
+    if venv_proc is not None:
+        wait_all(venv_proc)
 
 
 def setup_go(d: Path, day: int) -> None:
     """Set up the directory as a go module."""
+    import subprocess
+
     subprocess.run(
         ["go", "mod", "init", f"day{day:02d}"],
         check=True,
@@ -108,107 +409,55 @@ def setup_go(d: Path, day: int) -> None:
         stdout=subprocess.DEVNULL,
         stderr=subprocess.DEVNULL,
     )
-    with d.joinpath("main.go").open("w", encoding="utf8") as fid:
-        fid.writelines(
-            [
-                "package main\n",
-                "\n",
-                "import (\n",
-                '\t"fmt"\n',
-                '\t"os"\n',
-                ")\n",
-                "\n",
-                "func part1() {}\n",
-                "\n",
-                "func part2() {}\n",
-                "\n",
-                "func main() {\n",
-                '\tif len(os.Args) < 2 || os.Args[1] == "1" {\n',
-                '\t\tfmt.Println("Part 1")\n',
-                "\t\tpart1()\n",
-                "\t}\n",
-                '\tif len(os.Args) < 2 || os.Args[1] == "2" {\n',
-                '\t\tfmt.Println("Part 2")\n',
-                "\t\tpart2()\n",
-                "\t}\n",
-                "}\n",
-            ],
-        )
-    with d.joinpath(".gitignore").open("w", encoding="utf8") as fid:
-        fid.write(f"/day{day:02d}\n")
+    write_files(d, {"main.go": GO_MAIN, ".gitignore": f"/day{day:02d}\n"})
 
 
-def setup_js(d: Path, day: int, ext: str | None = "js") -> None:
-    """Set up the directory as a node.js script."""
-    subprocess.run(
-        ["npm", "init", "-y"],
-        check=True,
-        cwd=d,
-        stdout=subprocess.DEVNULL,
+def init_node(d: Path, day: int, ext: str, start: str, gitignore: str) -> None:
+    """Create the node project and its `index.{ext}`, using the given start script."""
+    # Fill in the template rather than starting up npm, or building and dumping JSON
+    write_files(
+        d,
+        {
+            "package.json": PACKAGE_JSON.format(day=day, start=start),
+            f"index.{ext}": JS_INDEX,
+            ".gitignore": gitignore,
+        },
     )
-    with d.joinpath("package.json").open("r", encoding="utf8") as fid:
-        pkg = json.load(fid)
-    pkg["name"] = f"day{day:02d}"
-    pkg["scripts"]["start"] = "node index.js"
-    with d.joinpath("package.json").open("w", encoding="utf8") as fid:
-        json.dump(pkg, fid, indent=4)
+
+
+def install_node(d: Path, *dev_deps: str) -> subprocess.Popen[bytes]:
+    """Start installing the node typings, and any other dev dependencies.
+
+    This doesn't wait for the install to finish; use `wait_all` for that
+    """
+    import subprocess
+
     # Add node typings so VSC knows this is a node project
-    subprocess.run(
-        ["npm", "install", "--save-dev", "@types/node"],
-        check=True,
+    return subprocess.Popen(
+        ["npm", "install", "--save-dev", "@types/node", *dev_deps],
         cwd=d,
         stdout=subprocess.DEVNULL,
     )
-    with d.joinpath(f"index.{ext}").open("w", encoding="utf8") as fid:
-        fid.writelines(
-            [
-                "function part1() {}\n",
-                "\n",
-                "function part2() {}\n",
-                "\n",
-                'if (process.argv.length < 2 || process.argv[1] === "1") {\n',
-                '    console.log("Part 1");\n',
-                "    part1();\n",
-                "}\n",
-                "\n",
-                'if (process.argv.length < 2 || process.argv[1] === "2") {\n',
-                '    console.log("Part 2");\n',
-                "    part2();\n",
-                "}\n",
-            ],
-        )
-    with d.joinpath(".gitignore").open("w", encoding="utf8") as fid:
-        fid.write("/node_modules\n")
+
+
+def setup_js(d: Path, day: int) -> None:
+    """Set up the directory as a node.js script."""
+    init_node(d, day, "js", "node index.js", "/node_modules\n")
+    wait_all(install_node(d))
 
 
 def setup_ts(d: Path, day: int) -> None:
     """Set up the directory as a Typescript (to node.js) script."""
-    # Start as if just vanilla JS
-    setup_js(d, day, "ts")
-    # Fix up the start script to use TSC
-    with d.joinpath("package.json").open("r", encoding="utf8") as fid:
-        pkg = json.load(fid)
-    pkg["scripts"]["start"] = "npx tsc && node index.js"
-    with d.joinpath("package.json").open("w", encoding="utf8") as fid:
-        json.dump(pkg, fid, indent=4)
-    subprocess.run(
-        ["npm", "install", "--save-dev", "typescript"],
-        check=True,
-        cwd=d,
-        stdout=subprocess.DEVNULL,
-    )
-    subprocess.run(
-        ["npx", "tsc", "--init"],
-        check=True,
-        cwd=d,
-        stdout=subprocess.DEVNULL,
-    )
-    with d.joinpath(".gitignore").open("w", encoding="utf8") as fid:
-        fid.write("/index.js\n/node_modules\n")
+    init_node(d, day, "ts", "npx tsc && node index.js", "/index.js\n/node_modules\n")
+    # Writing the config ourselves saves starting up `npx tsc --init` for it
+    write_files(d, {"tsconfig.json": TSCONFIG_JSON})
+    wait_all(install_node(d, "typescript"))
 
 
 def setup_rs(d: Path, day: int) -> None:
     """Set up the directory as a Rust Crate."""
+    import subprocess
+
     subprocess.run(
         ["cargo", "init", "--name", f"day{day:02d}", "--bin", "--vcs", "none"],
         check=True,
@@ -217,51 +466,56 @@ def setup_rs(d: Path, day: int) -> None:
         stderr=subprocess.DEVNULL,
     )
 
-    with d.joinpath(".gitignore").open("w", encoding="utf8") as fid:
-        fid.write("/target\n")
-    with d.joinpath("src", "main.rs").open("w", encoding="utf8") as fid:
-        fid.writelines(
-            [
-                "fn part1() {}\n",
-                "\n",
-                "fn part2() {}\n",
-                "\n",
-                "fn main() {\n",
-                "let (p1, p2) = if let Some(which) = std::env::args().nth(1) {\n"
-                '        (which == "1", which == "2")\n'
-                "    } else {\n"
-                "        (true, true)\n"
-                "    };\n"
-                "    if p1 {\n"
-                '        println!("Part 1");\n'
-                "        part1();\n"
-                "    }\n"
-                "    if p2 {\n"
-                '        println!("Part 2");\n'
-                "        part2();\n"
-                "    }\n"
-                "}\n",
-            ],
-        )
+    write_files(d, {".gitignore": "/target\n", "src/main.rs": RS_MAIN})
 
 
-SETUPS: dict[Language, Callable[[Path, int], None]] = {
-    "go": setup_go,
-    "py": setup_py,
-    "js": setup_js,
-    "ts": setup_ts,
-    "rs": setup_rs,
-}
-"""Setup function mapping. The value is a function that will take in the path
-and the current day, and set up the directory given by the path for that
-language"""
+def dispatch(lang: Language, d: Path, day: int, venv: bool = False) -> None:
+    """Set up the directory given by the path for the language and current day.
+
+    `venv` only applies to Python; see `setup_py`
+    """
+    match lang:
+        case "go":
+            setup_go(d, day)
+        case "py":
+            setup_py(d, day, venv)
+        case "js":
+            setup_js(d, day)
+        case "ts":
+            setup_ts(d, day)
+        case "rs":
+            setup_rs(d, day)
+
 
 if __name__ == "__main__":
     args = parse_args()
-    p = Path(f"day{args.day:02d}", f"{args.lang}-{args.user}-day{args.day:02d}")
-    if p.is_dir():
-        print("You've already started on that!", file=sys.stderr)
+    import subprocess
+    from concurrent.futures import ThreadPoolExecutor
+
+    dirs: dict[int, Path] = {}
+    for day in args.days:
+        p = Path(f"day{day:02d}", f"{args.lang}-{args.user}-day{day:02d}")
+        try:
+            p.mkdir(parents=True)
+        except FileExistsError:
+            print(f"You've already started on {p}!", file=sys.stderr)
+        else:
+            dirs[day] = p
+    if not dirs:
         sys.exit(1)
-    p.mkdir(parents=True, exist_ok=True)
-    SETUPS[args.lang](p, args.day)
-    subprocess.run(["code", p.resolve()], check=True)
+
+    # Setting up is mostly waiting on the toolchains, so set up every day at once
+    with ThreadPoolExecutor() as pool:
+        futures = [
+            pool.submit(dispatch, args.lang, p, day, args.venv)
+            for day, p in dirs.items()
+        ]
+    for future in futures:
+        future.result()
+    # Nothing's left to do once the editor's up, so don't wait on its launcher
+    subprocess.Popen(
+        ["code", *(p.resolve() for p in dirs.values())],
+        start_new_session=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )